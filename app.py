@@ -1,58 +1,335 @@
 # app.py
 import os
-import re
-import json
-import math
+
+# `gunicorn -k gevent` patches the stdlib itself before importing us. For a
+# standalone gevent server (TUBEMATE_GEVENT=1), patch here, before threading/
+# queue/subprocess are imported, so each SSE stream is a greenlet, not a thread.
+USE_GEVENT = os.environ.get("TUBEMATE_GEVENT", "").lower() in ("1", "true", "yes")
+if USE_GEVENT:
+    from gevent import monkey
+    monkey.patch_all()
+
+import time
+import stat
+import hashlib
+import functools
+import tempfile
 import shutil
+import queue
 import pathlib
+import threading
 import subprocess
-from urllib.parse import unquote
-from flask import Flask, request, jsonify, Response, send_from_directory, abort
-
-app = Flask(__name__)
+from operator import itemgetter
+from collections import OrderedDict
+from urllib.parse import unquote, urlsplit, parse_qsl
+import ijson
+import orjson
+from ijson.common import ObjectBuilder
+from yt_dlp import YoutubeDL
+from yt_dlp.utils import DownloadCancelled, DownloadError
+from flask import Flask, request, jsonify, Response, send_from_directory
+
+app = Flask(__name__, static_folder="static", static_url_path="/static")
+# Behind a proxy that honours X-Sendfile, let it stream files via sendfile(2)
+app.use_x_sendfile = os.environ.get("TUBEMATE_X_SENDFILE", "").lower() in ("1", "true", "yes")
 
 # --- Binaries ---
 YT_DLP = shutil.which("yt-dlp") or "yt-dlp"
 FFMPEG = shutil.which("ffmpeg") or "ffmpeg"
 
+# Format string for playlists: <=720p mixed if available, else best <=720
+DEFAULT_PLAYLIST_FORMAT = "bv*[height<=720]+ba/b[height<=720]"
+
+# Idle seconds before an SSE comment is sent so proxies keep the stream open
+SSE_KEEPALIVE = 15
+
+# --- yt-dlp message dispatch ---
+# Messages we care about are "[tag] ..." or "ERROR: ...". The tag is sliced
+# off once and looked up in a dict, instead of trying each prefix in turn.
+# "[download]" is refined in parse_ytdlp_line (destination / already).
+TAG_DISPATCH = {
+    "[Merger]": "merging",
+    "[ExtractAudio]": "postprocess",
+    "[youtube]": "info",
+    "[info]": "info",
+}
+
+# --- /get_formats cache (url -> (monotonic timestamp, response payload)) ---
+FORMATS_CACHE_TTL = 300
+FORMATS_CACHE_SIZE = 128
+_FORMATS_CACHE = OrderedDict()
+_FORMATS_CACHE_LOCK = threading.Lock()
+
+# --- Metadata handed from /get_formats to /progress ---
+# Per-user on POSIX, where the temp dir is shared (%TEMP% is per-user on Windows)
+INFO_JSON_DIR = os.path.join(
+    tempfile.gettempdir(), f"tubemate-{os.getuid()}" if hasattr(os, "getuid") else "tubemate"
+)
+INFO_JSON_TTL = 600
+
+# Read size for yt-dlp's stdout pipe
+PIPE_BUFSIZE = 64 * 1024
+
 # --- Helpers ---
-def run_cmd_once(cmd):
-    """Run a command and return (stdout, stderr, returncode)."""
-    try:
-        p = subprocess.run(cmd, capture_output=True, text=True)
-        return p.stdout, p.stderr, p.returncode
-    except FileNotFoundError:
-        return "", f"Command not found: {cmd[0]}", 127
+_UNITS = ("B", "KB", "MB", "GB", "TB")
 
 def human_bytes(n):
     """Convert bytes -> human-readable string."""
     try:
-        n = float(n)
-    except Exception:
+        n = int(n)
+    except (TypeError, ValueError):
         return None
-    if n == 0:
+    if n <= 0:
         return "0 B"
-    units = ["B", "KB", "MB", "GB", "TB"]
-    i = int(math.floor(math.log(n, 1024)))
-    p = math.pow(1024, i)
-    s = round(n / p, 2)
-    return f"{s} {units[i]}"
+    # (bit_length - 1) // 10 == floor(log1024(n)), without the float math
+    i = min((n.bit_length() - 1) // 10, len(_UNITS) - 1)
+    s = round(n / (1 << (10 * i)), 2)
+    return f"{s} {_UNITS[i]}"
 
+@functools.lru_cache(maxsize=128)
 def safe_path(p):
-    """Path safety: expand user, resolve, and create if not exists."""
+    """Path safety: expand user, resolve, and create if not exists (memoized)."""
     if not p:
         return str(pathlib.Path.cwd())
     target = pathlib.Path(p).expanduser().resolve()
     target.mkdir(parents=True, exist_ok=True)
     return str(target)
 
-def default_playlist_format():
-    """Format string for playlists: <=720p mixed if available, else best <=720."""
-    return "bv*[height<=720]+ba/b[height<=720]"
+def parse_ytdlp_line(line):
+    """Turn one yt-dlp screen message into an SSE event dict (or None)."""
+    if not line:
+        return None
+    if line[0] == "[":
+        end = line.find("]") + 1
+        tag = line[:end]
+        if tag == "[download]":
+            rest = line[end:].lstrip()
+            if rest.startswith("Destination:"):
+                return {"status": "destination", "message": rest[len("Destination:"):].strip()}
+            if "has already been downloaded" in rest:
+                return {"status": "already", "message": line.strip()}
+            return None
+        status = TAG_DISPATCH.get(tag)
+        return {"status": status, "message": line.strip()} if status else None
+    if line.startswith("ERROR:"):
+        return {"status": "error", "message": line.strip()}
+    return None
+
+class EventLogger:
+    """yt-dlp logger that forwards interesting messages onto an event queue."""
+
+    def __init__(self, events):
+        self.events = events
+
+    def debug(self, msg):
+        event = parse_ytdlp_line(msg)
+        if event:
+            self.events.put(event)
+
+    def warning(self, msg):
+        pass
+
+    def error(self, msg):
+        self.debug(msg)
+
+def cached_formats(url):
+    """Return the cached /get_formats payload for url, or None if missing/stale."""
+    with _FORMATS_CACHE_LOCK:
+        hit = _FORMATS_CACHE.get(url)
+        if hit is None:
+            return None
+        ts, payload = hit
+        if time.monotonic() - ts >= FORMATS_CACHE_TTL:
+            del _FORMATS_CACHE[url]
+            return None
+        _FORMATS_CACHE.move_to_end(url)
+        return payload
+
+def store_formats(url, payload):
+    """Cache a /get_formats payload, evicting the least recently used entries."""
+    with _FORMATS_CACHE_LOCK:
+        _FORMATS_CACHE[url] = (time.monotonic(), payload)
+        _FORMATS_CACHE.move_to_end(url)
+        while len(_FORMATS_CACHE) > FORMATS_CACHE_SIZE:
+            _FORMATS_CACHE.popitem(last=False)
+
+def info_json_path(url):
+    """Location of the persisted `yt-dlp -J` output for url."""
+    digest = hashlib.sha1(url.encode("utf-8")).hexdigest()
+    return os.path.join(INFO_JSON_DIR, f"{digest}.info.json")
+
+def ensure_info_dir():
+    """Create INFO_JSON_DIR owner-only; False if it is unusable or not private to us.
+
+    /progress feeds whatever JSON it finds there to yt-dlp, so a directory that
+    someone else owns or can write to must not be trusted.
+    """
+    try:
+        os.makedirs(INFO_JSON_DIR, mode=0o700, exist_ok=True)
+        if hasattr(os, "getuid"):
+            st = os.lstat(INFO_JSON_DIR)
+            if not stat.S_ISDIR(st.st_mode) or st.st_uid != os.getuid() or st.st_mode & 0o077:
+                return False
+        return True
+    except OSError:
+        return False
+
+def prune_info_dir():
+    """Remove expired info JSONs and abandoned spool files."""
+    cutoff = time.time() - INFO_JSON_TTL
+    try:
+        with os.scandir(INFO_JSON_DIR) as it:
+            for entry in it:
+                if not entry.name.endswith((".info.json", ".part")):
+                    continue
+                try:
+                    if entry.stat().st_mtime < cutoff:
+                        discard_file(entry.path)
+                except OSError:
+                    pass
+    except OSError:
+        pass
+
+def save_info_json(url, spool_path):
+    """Keep a spooled `yt-dlp -J` output so the download can skip re-extraction."""
+    if not spool_path:
+        return
+    prune_info_dir()
+    try:
+        os.replace(spool_path, info_json_path(url))
+    except OSError:
+        discard_file(spool_path)
+
+def discard_file(path):
+    """Best-effort removal of a temporary file."""
+    if not path:
+        return
+    try:
+        os.remove(path)
+    except OSError:
+        pass
 
-def is_probably_playlist(url: str) -> bool:
-    u = (url or "").lower()
-    return ("list=" in u) or ("/playlist" in u)
+def fresh_info_json(url):
+    """Return the persisted info JSON path for url if it is recent enough, else None."""
+    if not ensure_info_dir():
+        return None
+    path = info_json_path(url)
+    try:
+        if time.time() - os.path.getmtime(path) < INFO_JSON_TTL:
+            return path
+    except OSError:
+        return None
+    # Stale: nothing else would ever clean it up
+    discard_file(path)
+    return None
+
+def format_entry(f):
+    """Trim a yt-dlp format dict to what the frontend needs (None -> 0 for sort keys)."""
+    size = f.get("filesize") or f.get("filesize_approx")
+    return {
+        "format_id": f.get("format_id"),
+        "height": f.get("height") or 0,
+        "fps": f.get("fps") or 0,
+        "ext": f.get("ext"),
+        "abr": f.get("abr") or 0,
+        "filesize": size,
+        "filesize_hr": human_bytes(size) if size else None,
+    }
+
+class TeeReader:
+    """File-like wrapper that copies everything read from src into sink."""
+
+    def __init__(self, src, sink=None):
+        self.src = src
+        self.sink = sink
+        self.nbytes = 0
+
+    def read(self, size=-1):
+        # read1: hand over whatever the pipe has instead of waiting for a full buffer
+        chunk = self.src.read1(size)
+        self.nbytes += len(chunk)
+        if self.sink is not None:
+            self.sink.write(chunk)
+        return chunk
+
+def open_spool():
+    """Temporary file next to the info JSONs (None if that dir is unusable)."""
+    if not ensure_info_dir():
+        return None
+    try:
+        return tempfile.NamedTemporaryFile(dir=INFO_JSON_DIR, suffix=".part", delete=False)
+    except OSError:
+        return None
+
+def fetch_formats(url, extra_args):
+    """Stream `yt-dlp -J` output and keep only video-only/audio-only formats.
+
+    Formats are parsed one at a time as yt-dlp writes them, so the full JSON is
+    never held in memory; a raw copy is spooled to disk for save_info_json().
+    Returns (info, error, spool_path).
+    """
+    info = {"title": None, "formats": 0, "entries": False, "video_formats": [], "audio_formats": []}
+    spool = open_spool()
+    spool_path = spool.name if spool else None
+    error = None
+    try:
+        with subprocess.Popen([YT_DLP, "-J"] + extra_args + [url],
+                              stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                              bufsize=PIPE_BUFSIZE) as proc:
+            reader = TeeReader(proc.stdout, spool)
+            builder = None
+            try:
+                for prefix, event, value in ijson.parse(reader, buf_size=PIPE_BUFSIZE, use_float=True):
+                    if builder is not None:
+                        builder.event(event, value)
+                        if prefix == "formats.item" and event == "end_map":
+                            f, builder = builder.value, None
+                            info["formats"] += 1
+                            if f.get("vcodec") != "none" and f.get("acodec") == "none":
+                                info["video_formats"].append(format_entry(f))
+                            elif f.get("acodec") != "none" and f.get("vcodec") == "none":
+                                info["audio_formats"].append(format_entry(f))
+                    elif prefix == "formats.item" and event == "start_map":
+                        builder = ObjectBuilder()
+                        builder.event(event, value)
+                    elif prefix == "title" and event == "string":
+                        info["title"] = value
+                    elif prefix == "entries.item":
+                        info["entries"] = True
+            except ijson.JSONError as e:
+                if reader.nbytes:
+                    error = f"Invalid JSON from yt-dlp: {str(e)}"
+                else:
+                    proc.stdout.close()
+                    error = f"No output from yt-dlp (exit {proc.wait()})"
+    except FileNotFoundError:
+        error = f"Command not found: {YT_DLP}"
+    finally:
+        if spool:
+            spool.close()
+
+    if error:
+        discard_file(spool_path)
+        return None, error, None
+    return info, None, spool_path
+
+def json_response(payload, status=200):
+    """JSON response serialized with orjson (faster than jsonify)."""
+    return Response(orjson.dumps(payload), status=status, mimetype="application/json")
+
+def split_url(url):
+    """Parse url once into (SplitResult, query dict with lower-cased keys)."""
+    parts = urlsplit(url or "")
+    qs = {k.lower(): v for k, v in parse_qsl(parts.query, keep_blank_values=True)}
+    return parts, qs
+
+def is_probably_playlist(parts, qs) -> bool:
+    """Playlist URLs carry a list= parameter or a /playlist... path segment.
+
+    Matches the frontend's isPlaylistUrl (/\/playlist/), so channel tabs like
+    /@chan/playlists count too.
+    """
+    return "list" in qs or "/playlist" in parts.path.lower()
 
 # --- API: Get formats for single video (video-only and audio-only only) ---
 @app.route("/get_formats", methods=["GET", "POST"])
@@ -63,75 +340,62 @@ def get_formats_api():
         payload = request.get_json(silent=True) or {}
         url = payload.get("url")
     if not url:
-        return jsonify({"error": "Missing url"}), 400
+        return json_response({"error": "Missing url"}, 400)
 
     # If clearly a playlist, skip listing formats
-    if is_probably_playlist(url):
-        return jsonify({
+    parts, qs = split_url(url)
+    if is_probably_playlist(parts, qs):
+        return json_response({
             "title": "Playlist",
             "is_playlist": True,
             "video_formats": [],
             "audio_formats": []
         })
 
-    def fetch_formats_for(given_url, extra_args):
-        out, err, code = run_cmd_once([YT_DLP, "-J"] + extra_args + [given_url])
-        raw_json = (out or "").strip() or (err or "").strip()
-        if not raw_json:
-            return None, f"No output from yt-dlp (exit {code})"
-        try:
-            return json.loads(raw_json), None
-        except json.JSONDecodeError as e:
-            return None, f"Invalid JSON from yt-dlp: {str(e)}"
+    cached = cached_formats(url)
+    if cached is not None:
+        return json_response(cached)
 
     # Try single video first
-    data, error = fetch_formats_for(url, ["--no-playlist"])
+    info, error, spool_path = fetch_formats(url, ["--no-playlist"])
     # Fallback: without --no-playlist (in case URL is ambiguous)
-    if not data or not data.get("formats"):
-        data, error = fetch_formats_for(url, [])
-        if data and data.get("entries") and not data.get("formats"):
+    if not info or not info["formats"]:
+        discard_file(spool_path)
+        info, error, spool_path = fetch_formats(url, [])
+        if info and info["entries"] and not info["formats"]:
             # Behaves like playlist; we skip format listing for playlists
-            return jsonify({
-                "title": data.get("title") or "Playlist",
+            discard_file(spool_path)
+            payload = {
+                "title": info["title"] or "Playlist",
                 "is_playlist": True,
                 "video_formats": [],
                 "audio_formats": []
-            })
+            }
+            store_formats(url, payload)
+            return json_response(payload)
 
-    if not data or not data.get("formats"):
-        return jsonify({"error": error or "No formats found"}), 404
-
-    formats = data.get("formats", [])
-    # Only expose video-only and audio-only
-    video_formats, audio_formats = [], []
-    for f in formats:
-        vcodec = f.get("vcodec")
-        acodec = f.get("acodec")
-        size = f.get("filesize") or f.get("filesize_approx")
-        it = {
-            "format_id": f.get("format_id"),
-            "height": f.get("height"),
-            "fps": f.get("fps"),
-            "ext": f.get("ext"),
-            "abr": f.get("abr"),
-            "filesize": size,
-            "filesize_hr": human_bytes(size) if size else None,
-        }
-        if vcodec != "none" and acodec == "none":
-            video_formats.append(it)
-        elif acodec != "none" and vcodec == "none":
-            audio_formats.append(it)
+    if not info or not info["formats"]:
+        discard_file(spool_path)
+        return json_response({"error": error or "No formats found"}, 404)
+
+    # Let /progress reuse this extraction instead of fetching it again
+    save_info_json(url, spool_path)
+
+    video_formats = info["video_formats"]
+    audio_formats = info["audio_formats"]
 
     # Sorts
-    video_formats.sort(key=lambda x: (x["height"] or 0, x["fps"] or 0), reverse=True)
-    audio_formats.sort(key=lambda x: (x["abr"] or 0), reverse=True)
+    video_formats.sort(key=itemgetter("height", "fps"), reverse=True)
+    audio_formats.sort(key=itemgetter("abr"), reverse=True)
 
-    return jsonify({
-        "title": data.get("title", "video"),
+    payload = {
+        "title": info["title"] or "video",
         "is_playlist": False,
         "video_formats": video_formats,
         "audio_formats": audio_formats
-    })
+    }
+    store_formats(url, payload)
+    return json_response(payload)
 
 # --- API: Download Progress (single or playlist) ---
 @app.route("/progress")
@@ -141,19 +405,46 @@ def progress():
     quality = request.args.get("quality", "").strip()
     download_path = safe_path(unquote(request.args.get("download_path", "").strip()))
     force_playlist = request.args.get("is_playlist", "false").lower() in ("1", "true", "yes")
-    playlist_mode = force_playlist or is_probably_playlist(url)
+    parts, qs = split_url(url)
+    playlist_mode = force_playlist or is_probably_playlist(parts, qs)
 
     if not url:
         return jsonify({"error": "Missing url"}), 400
 
-    cmd = [YT_DLP, "--newline"]
+    events = queue.Queue()
+    # Set when the SSE client goes away (e.g. the UI's Stop button)
+    cancelled = threading.Event()
+
+    def hook(d):
+        # yt-dlp calls this from the download thread with structured progress
+        if cancelled.is_set():
+            raise DownloadCancelled("Client disconnected")
+        if d["status"] == "downloading":
+            total = d.get("total_bytes") or d.get("total_bytes_estimate")
+            done = d.get("downloaded_bytes")
+            events.put({
+                "status": "downloading",
+                "percent": round(done * 100 / total, 1) if total and done is not None else None,
+                "size": (d.get("_total_bytes_str") or d.get("_total_bytes_estimate_str") or "").strip(),
+                "speed": (d.get("_speed_str") or "").strip(),
+                "eta": (d.get("_eta_str") or "").strip()
+            })
+
+    ydl_opts = {
+        "progress_hooks": [hook],
+        "logger": EventLogger(events),
+        "noprogress": True,
+        "no_color": True,
+        # The yt-dlp CLI defaults to this: skip entries that fail to download
+        # (private/deleted playlist videos) instead of aborting the whole run
+        "ignoreerrors": "only_download",
+    }
 
     if playlist_mode:
-        out_tmpl = os.path.join(download_path, "%(playlist_title,channel)s", "%(title)s.%(ext)s")
-        fmt = default_playlist_format()
-        cmd += ["-f", fmt, "--yes-playlist"]
+        out_tmpl = f"{download_path}/%(playlist_title,channel)s/%(title)s.%(ext)s"
+        ydl_opts.update({"format": DEFAULT_PLAYLIST_FORMAT, "noplaylist": False, "outtmpl": out_tmpl})
     else:
-        out_tmpl = os.path.join(download_path, "%(title)s.%(ext)s")
+        out_tmpl = f"{download_path}/%(title)s.%(ext)s"
         if not quality:
             return jsonify({"error": "Missing quality (vfmt or vfmt+afmt) for single video"}), 400
 
@@ -164,90 +455,81 @@ def progress():
             # This ensures audio gets downloaded and muxed with the selected video
             quality = f"{quality}+ba"
 
-        cmd += ["-f", quality, "--no-playlist"]
+        ydl_opts.update({"format": quality, "noplaylist": True, "outtmpl": out_tmpl})
 
     if FFMPEG:
-        cmd += ["--ffmpeg-location", FFMPEG]
+        ydl_opts["ffmpeg_location"] = FFMPEG
 
-    cmd += ["-o", out_tmpl, url]
+    # Metadata saved by /get_formats (single videos only) spares a full re-extract
+    info_file = None if playlist_mode else fresh_info_json(url)
 
-    # [download]  12.3% of 12.34MiB at 1.23MiB/s ETA 00:11
-    progress_re = re.compile(
-        r"^\[download\]\s+(?P<pct>\d{1,3}(?:\.\d+)?)%\s+of\s+(?P<size>\S+)\s+at\s+(?P<speed>\S+)\s+ETA\s+(?P<eta>\S+)"
-    )
+    def run_download():
+        try:
+            try:
+                with YoutubeDL(ydl_opts) as ydl:
+                    if info_file:
+                        try:
+                            ret = ydl.download_with_info_file(info_file)
+                        except FileNotFoundError:
+                            # Info file vanished (e.g. a concurrent download consumed it)
+                            ret = ydl.download([url])
+                    else:
+                        ret = ydl.download([url])
+            except DownloadCancelled:
+                # Nobody is listening any more; stop quietly
+                return
+            except DownloadError:
+                # Already reported through the logger as an "ERROR:" line
+                ret = 1
+            finally:
+                discard_file(info_file)
+            if ret == 0:
+                events.put({"status": "finished"})
+            else:
+                events.put({"status": "error", "message": f"yt-dlp exited with code {ret}"})
+        except Exception as e:
+            events.put({"status": "error", "message": repr(e)})
+        finally:
+            events.put(None)
 
     def sse_stream():
         def send(event_dict):
-            yield f"data: {json.dumps(event_dict, ensure_ascii=False)}\n\n"
+            yield b"data: " + orjson.dumps(event_dict) + b"\n\n"
 
         yield from send({"status": "starting"})
+        worker = threading.Thread(target=run_download, daemon=True)
+        worker.start()
         try:
-            with subprocess.Popen(
-                cmd,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,
-                text=True,
-                bufsize=1,
-                universal_newlines=True
-            ) as proc:
-                for line in proc.stdout:
-                    line = line.rstrip()
-                    m = progress_re.match(line)
-                    if m:
-                        try:
-                            pct = float(m.group("pct"))
-                        except Exception:
-                            pct = None
-                        yield from send({
-                            "status": "downloading",
-                            "percent": pct,
-                            "size": m.group("size"),
-                            "speed": m.group("speed"),
-                            "eta": m.group("eta")
-                        })
-                        continue
-
-                    if line.startswith("[download] Destination:"):
-                        yield from send({"status": "destination", "message": line.split("Destination:", 1)[-1].strip()})
-                    elif "has already been downloaded" in line:
-                        yield from send({"status": "already", "message": line.strip()})
-                    elif line.startswith("[Merger]"):
-                        yield from send({"status": "merging", "message": line.strip()})
-                    elif line.startswith("[ExtractAudio]"):
-                        yield from send({"status": "postprocess", "message": line.strip()})
-                    elif line.startswith("[youtube]") or line.startswith("[info]"):
-                        yield from send({"status": "info", "message": line.strip()})
-                    elif line.startswith("ERROR:"):
-                        yield from send({"status": "error", "message": line.strip()})
-
-                ret = proc.wait()
-                if ret == 0:
-                    yield from send({"status": "finished"})
-                else:
-                    yield from send({"status": "error", "message": f"yt-dlp exited with code {ret}"})
-        except FileNotFoundError as e:
-            yield f"data: {json.dumps({'status':'error','message': str(e)})}\n\n"
-        except Exception as e:
-            yield f"data: {json.dumps({'status':'error','message': repr(e)})}\n\n"
-
-    return Response(sse_stream(), mimetype="text/event-stream")
+            while True:
+                try:
+                    event = events.get(timeout=SSE_KEEPALIVE)
+                except queue.Empty:
+                    if not worker.is_alive():
+                        break
+                    yield b": keepalive\n\n"
+                    continue
+                if event is None:
+                    break
+                yield from send(event)
+        finally:
+            # Also runs on GeneratorExit when the client closes the stream
+            cancelled.set()
+
+    return Response(sse_stream(), mimetype="text/event-stream", direct_passthrough=True)
 
 # --- Web pages ---
 @app.route("/")
 def root():
-    idx = pathlib.Path("index.html")
-    if idx.exists():
-        return idx.read_text(encoding="utf-8")
+    if os.path.exists(os.path.join(app.root_path, "index.html")):
+        return send_from_directory(app.root_path, "index.html", max_age=3600)
     return "Place index.html next to app.py or host frontend separately."
 
-@app.route("/static/<path:path>")
-def static_files(path):
-    base = pathlib.Path("static").resolve()
-    file_path = base / path
-    if not file_path.exists():
-        abort(404)
-    return send_from_directory(str(base), path)
+# /static/* is served by Flask's built-in static route (see app = Flask(...))
 
 if __name__ == "__main__":
     # For production: gunicorn -w 2 -k gevent app:app
-    app.run(host="0.0.0.0", port=5000, debug=True, threaded=True)
+    if USE_GEVENT:
+        from gevent.pywsgi import WSGIServer
+        WSGIServer(("0.0.0.0", 5000), app).serve_forever()
+    else:
+        app.run(host="0.0.0.0", port=5000, debug=True, threaded=True)
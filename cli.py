@@ -1,28 +1,52 @@
+import re
 import subprocess
 import json
 import os
 import sys
 import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 YT_DLP = shutil.which("yt-dlp") or "yt-dlp"
 FFMPEG = shutil.which("ffmpeg") or "ffmpeg"
+PLAYLIST_WORKERS = 4
 
-def run_cmd(cmd):
-    """Run a shell command and return stdout, None on error."""
+# \w is str.isalnum() plus "_", so this keeps exactly alnum and " _-"
+_UNSAFE_FILENAME_RE = re.compile(r"[^\w _-]")
+
+_print_lock = threading.Lock()
+
+def log(*lines):
+    """Print lines without interleaving output from parallel downloads."""
+    with _print_lock:
+        for line in lines:
+            print(line)
+
+def run_cmd(cmd, capture_stderr=True):
+    """Run a shell command and return stdout, None on error.
+
+    With capture_stderr=False nothing is buffered: the command writes straight
+    to the terminal (native yt-dlp progress) and "" is returned on success.
+    """
     try:
-        result = subprocess.run(cmd, capture_output=True, text=True)
+        if capture_stderr:
+            result = subprocess.run(cmd, capture_output=True, text=True)
+        else:
+            result = subprocess.run(cmd, stdout=None, stderr=None)
         if result.returncode != 0:
-            print(f"❌ Error running: {' '.join(cmd)}")
-            print(result.stderr.strip())
+            if capture_stderr:
+                log(f"❌ Error running: {' '.join(cmd)}", result.stderr.strip())
+            else:
+                log(f"❌ Error running: {' '.join(cmd)}")
             return None
-        return result.stdout
+        return result.stdout if capture_stderr else ""
     except FileNotFoundError:
         print(f"❌ Command not found: {cmd[0]}")
         sys.exit(1)
 
 def safe_filename(name):
     """Remove illegal filename characters."""
-    return "".join(c for c in name if c.isalnum() or c in " _-").strip()
+    return _UNSAFE_FILENAME_RE.sub("", name).strip()
 
 def get_formats(url):
     """Get available video/audio formats for single video."""
@@ -30,23 +54,33 @@ def get_formats(url):
     if not output:
         return None, None, None
 
+    video_formats = []
+    audio_formats = []
+    seen = set()
+
+    def split_format(d):
+        # Called for every JSON object, innermost first: sort format dicts into
+        # the two lists as they are parsed and drop them from the tree.
+        if "vcodec" not in d or "acodec" not in d or "formats" in d:
+            return d
+        fmt_id = d.get("format_id")
+        if fmt_id in seen:  # "requested_formats" repeats entries of "formats"
+            return None
+        seen.add(fmt_id)
+        it = {"format_id": fmt_id, "height": d.get("height"), "ext": d.get("ext"), "filesize": d.get("filesize")}
+        if d["vcodec"] != "none" and d["acodec"] == "none":
+            video_formats.append(it)
+        elif d["acodec"] != "none" and d["vcodec"] == "none":
+            audio_formats.append(it)
+        return None
+
     try:
-        data = json.loads(output)
+        data = json.loads(output, object_hook=split_format)
     except json.JSONDecodeError:
         print("❌ Failed to parse yt-dlp JSON output.")
         return None, None, None
 
     title = data.get("title", "video")
-    formats = data.get("formats", [])
-    video_formats = []
-    audio_formats = []
-
-    for f in formats:
-        if f.get("vcodec") != "none" and f.get("acodec") == "none":
-            video_formats.append(f)
-        elif f.get("acodec") != "none" and f.get("vcodec") == "none":
-            audio_formats.append(f)
-
     return title, video_formats, audio_formats
 
 def choose_video_format(video_formats):
@@ -76,15 +110,15 @@ def download_and_merge(url, video_fmt, audio_fmt, output_name):
 
     try:
         print("📥 Downloading video...")
-        if run_cmd([YT_DLP, "-f", video_fmt, "-o", video_file, url]) is None:
+        if run_cmd([YT_DLP, "-f", video_fmt, "-o", video_file, url], capture_stderr=False) is None:
             return False
 
         print("📥 Downloading audio...")
-        if run_cmd([YT_DLP, "-f", audio_fmt, "-o", audio_file, url]) is None:
+        if run_cmd([YT_DLP, "-f", audio_fmt, "-o", audio_file, url], capture_stderr=False) is None:
             return False
 
         print("🔄 Merging...")
-        if run_cmd([FFMPEG, "-y", "-i", video_file, "-i", audio_file, "-c", "copy", output_name]) is None:
+        if run_cmd([FFMPEG, "-y", "-i", video_file, "-i", audio_file, "-c", "copy", output_name], capture_stderr=False) is None:
             return False
 
         print(f"✅ Done! Saved as {output_name}")
@@ -116,27 +150,36 @@ def download_playlist(url):
 
     print(f"✅ Found {len(entries)} videos.\n")
 
+    jobs = []
     for i, entry in enumerate(entries, 1):
-        vid_id = entry.get("url")
-       
-        
-      
         title = entry.get("title", f"video_{i}")
-        safe_title_str = safe_filename(title)
-
-        print(f"📹 Downloading {i}/{len(entries)} — {title}")
-        cmd = [
-            YT_DLP,
-            "-f", "bv*[height<=720]+ba/b[height<=720]",
-            "-o", f"{safe_title_str}.%(ext)s",
-
-           vid_id
-        ]
-
-        if run_cmd(cmd) is None:
-            print(f"⚠ Failed: {title}")
-        else:
-            print(f"✅ Finished: {title}\n")
+        # Index prefix keeps names unique: parallel jobs must never share a
+        # .part file (duplicate titles, or titles that sanitize to "")
+        out_name = f"{i:03d} {safe_filename(title)}".rstrip()
+        jobs.append((i, len(entries), entry.get("url"), title, out_name))
+
+    # Downloads are network-bound, so run a few at once
+    with ThreadPoolExecutor(max_workers=PLAYLIST_WORKERS) as ex:
+        list(ex.map(download_playlist_entry, jobs))
+
+def download_playlist_entry(job):
+    """Download one playlist entry in <=720p."""
+    i, total, vid_id, title, out_name = job
+    log(f"📹 Downloading {i}/{total} — {title}")
+    # Parallel jobs share the terminal, so no live progress bars here; stderr
+    # stays captured so run_cmd can log() the failure reason
+    cmd = [
+        YT_DLP,
+        "--no-progress",
+        "-f", "bv*[height<=720]+ba/b[height<=720]",
+        "-o", f"{out_name}.%(ext)s",
+        vid_id
+    ]
+
+    if run_cmd(cmd) is None:
+        log(f"⚠ Failed: {title}")
+    else:
+        log(f"✅ Finished: {title}\n")
 
 if __name__ == "__main__":
     url = input("Enter YouTube URL: ").strip()